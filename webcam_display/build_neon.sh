@@ -0,0 +1,15 @@
+#!/bin/bash
+# Build the optional NEON pixel-kernel library next to kernels.py.
+# kernels.py picks it up automatically on the next start; without it
+# the Python fallbacks are used.
+set -e
+cd "$(dirname "$0")"
+
+CFLAGS="-O3 -shared -fPIC"
+case "$(uname -m)" in
+    aarch64) CFLAGS="$CFLAGS -march=armv8-a+simd" ;;
+    armv7l)  CFLAGS="$CFLAGS -mfpu=neon" ;;
+esac
+
+cc $CFLAGS -o libneonkernels.so neon_kernels.c
+echo "Built libneonkernels.so"
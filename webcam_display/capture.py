@@ -1,29 +1,80 @@
 """Webcam capture using OpenCV with V4L2 backend."""
 
+import time
+
 import cv2
+import numpy as np
+
+# A grab() that returns faster than this came from the driver's buffer
+# queue, not a fresh exposure — keep draining until one actually blocks.
+_STALE_GRAB_SECONDS = 0.003
+
+# Safety bound on the drain loop in case grab timing misbehaves
+_MAX_DRAIN_GRABS = 8
 
 
 class WebcamCapture:
     """Captures frames from a USB webcam via OpenCV."""
 
     def __init__(self, device_index=0, width=640, height=480,
-                 use_mjpeg=True, buffer_size=1):
+                 pixel_format="MJPG", buffer_size=1, backend="v4l2"):
         self.device_index = device_index
         self.width = width
         self.height = height
-        self.use_mjpeg = use_mjpeg
+        self.pixel_format = pixel_format
         self.buffer_size = buffer_size
+        self.backend = backend
         self.cap = None
+        # Reusable decode targets. Three are rotated so that even with
+        # capture free-running in its own thread there is always a
+        # buffer to decode into that is neither the one just published
+        # nor the one the consumer holds (see hold()). Allocated lazily
+        # from the first frame since the driver decides the shape.
+        self._bufs = None
+        self._buf_idx = 0
+        self._held = None
+
+    def _gst_pipeline(self):
+        """Build a GStreamer pipeline with a strictly 1-deep sink queue.
+
+        appsink max-buffers=1 drop=true bounds latency to one frame in
+        the pipeline itself — stale frames are dropped before they ever
+        reach the decoder, which CAP_PROP_BUFFERSIZE on the V4L2
+        backend cannot guarantee (many drivers ignore it).
+        """
+        if self.pixel_format == "MJPG":
+            decode = (f"image/jpeg,width={self.width},"
+                      f"height={self.height} ! jpegdec ! ")
+        else:
+            decode = (f"video/x-raw,width={self.width},"
+                      f"height={self.height} ! ")
+        return (f"v4l2src device=/dev/video{self.device_index} ! "
+                f"{decode}videoconvert ! video/x-raw,format=BGR ! "
+                "appsink max-buffers=1 drop=true sync=false")
 
     def open(self):
+        if self.backend == "gstreamer":
+            pipeline = self._gst_pipeline()
+            self.cap = cv2.VideoCapture(pipeline, cv2.CAP_GSTREAMER)
+            if not self.cap.isOpened():
+                raise RuntimeError(
+                    f"Cannot open GStreamer pipeline: {pipeline}")
+            print(f"Webcam opened via GStreamer: {pipeline}")
+            return
+
         self.cap = cv2.VideoCapture(self.device_index, cv2.CAP_V4L2)
         if not self.cap.isOpened():
             raise RuntimeError(
                 f"Cannot open video device {self.device_index}")
 
-        if self.use_mjpeg:
+        if self.pixel_format:
             self.cap.set(cv2.CAP_PROP_FOURCC,
-                         cv2.VideoWriter_fourcc(*"MJPG"))
+                         cv2.VideoWriter_fourcc(*self.pixel_format))
+        if self.pixel_format == "YUYV":
+            # Hand back the raw packed YUYV buffer instead of decoding
+            # to BGR here — the display converts it straight to the
+            # framebuffer pixel format, skipping the BGR intermediate.
+            self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
 
         self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
         self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
@@ -34,16 +85,68 @@ class WebcamCapture:
         print(f"Webcam opened: {actual_w}x{actual_h}")
 
     def read(self):
-        """Read a frame. Returns the frame (BGR numpy array) or None on failure."""
-        ret, frame = self.cap.read()
+        """Read the newest frame, or None on failure.
+
+        Returns a BGR numpy array, or the raw packed (H, W, 2) YUYV
+        buffer when pixel_format is "YUYV". The returned array is an
+        internal buffer reused across calls: consumers that overlap
+        with capture must pass the frame they are using to hold() so
+        it is kept out of the decode rotation until they take a newer
+        one.
+
+        Splits cap.read() into grab() + retrieve(): grab() dequeues a
+        frame without decoding it, so any stale frames sitting in the
+        V4L2 queue are drained cheaply and only the frame we actually
+        return pays for MJPEG decode.
+        """
+        grabbed = False
+        for _ in range(_MAX_DRAIN_GRABS):
+            start = time.monotonic()
+            if not self.cap.grab():
+                break
+            grabbed = True
+            # A slow grab waited on the sensor — this frame is fresh.
+            if time.monotonic() - start > _STALE_GRAB_SECONDS:
+                break
+        if not grabbed:
+            return None
+
+        if self._bufs is None:
+            ret, frame = self.cap.retrieve()
+            if not ret or frame is None:
+                return None
+            self._bufs = [frame, np.empty_like(frame),
+                          np.empty_like(frame)]
+            self._buf_idx = 0
+            return frame
+
+        # Rotate to the next buffer, skipping the consumer-held one
+        buf = None
+        for _ in range(len(self._bufs)):
+            self._buf_idx = (self._buf_idx + 1) % len(self._bufs)
+            candidate = self._bufs[self._buf_idx]
+            if candidate is not self._held:
+                buf = candidate
+                break
+        ret, frame = self.cap.retrieve(buf)
         if not ret:
             return None
         return frame
 
+    def hold(self, frame):
+        """Mark *frame* as owned by the consumer.
+
+        read() will not decode into it until a newer frame is held, so
+        the caller can keep displaying it while capture runs on.
+        """
+        self._held = frame
+
     def close(self):
         if self.cap is not None:
             self.cap.release()
             self.cap = None
+        self._bufs = None
+        self._held = None
 
     def __enter__(self):
         self.open()
@@ -2,9 +2,15 @@
 DEVICE_INDEX = 0
 CAPTURE_WIDTH = 320
 CAPTURE_HEIGHT = 240
-USE_MJPEG = True
+# "MJPG": hardware-compressed, cheap on USB but needs JPEG decode.
+# "YUYV": raw from the sensor, no decode — cheaper CPU-wise at low res.
+PIXEL_FORMAT = "MJPG"
 BUFFER_SIZE = 1
 TARGET_FPS = 15
+# "v4l2": OpenCV's V4L2 backend.
+# "gstreamer": v4l2src pipeline with a 1-deep appsink queue — use when
+# the driver ignores BUFFER_SIZE and latency builds up.
+CAPTURE_BACKEND = "v4l2"
 
 # Framebuffer display settings
 FB_DEVICE = "/dev/fb0"
@@ -4,40 +4,101 @@ import ctypes
 import fcntl
 import mmap
 import os
-import struct
+import time
+import zlib
 
-import cv2
 import numpy as np
 
+# cv2 is only needed for raw YUYV input; the BGR paths run entirely on
+# NumPy / Numba so the display works without OpenCV loaded.
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+import kernels
 from framebuffer_setup import ensure_framebuffer
 
 # Linux framebuffer ioctl constants
 FBIOGET_VSCREENINFO = 0x4600
+FBIOPUT_VSCREENINFO = 0x4601
 FBIOGET_FSCREENINFO = 0x4602
-
-# line_length offset in fb_fix_screeninfo depends on sizeof(unsigned long):
-#   32-bit: id(16) + smem_start(4) + smem_len(4) + type(4) + type_aux(4)
-#           + visual(4) + xpanstep(2) + ypanstep(2) + ywrapstep(2) + pad(2)
-#           = offset 44
-#   64-bit: id(16) + smem_start(8) + smem_len(4) + type(4) + type_aux(4)
-#           + visual(4) + xpanstep(2) + ypanstep(2) + ywrapstep(2) + pad(2)
-#           = offset 48
-_ULONG_SIZE = ctypes.sizeof(ctypes.c_ulong)
-_LINE_LENGTH_OFFSET = 44 if _ULONG_SIZE == 4 else 48
-
-
-def _parse_vscreeninfo(buf):
-    """Extract fields from fb_var_screeninfo (first 40 bytes are enough)."""
-    fields = struct.unpack_from("8I", buf, 0)
-    return {
-        "xres": fields[0],
-        "yres": fields[1],
-        "xres_virtual": fields[2],
-        "yres_virtual": fields[3],
-        "xoffset": fields[4],
-        "yoffset": fields[5],
-        "bits_per_pixel": fields[6],
-    }
+FBIOPAN_DISPLAY = 0x4606
+FBIO_WAITFORVSYNC = 0x40044620  # _IOW('F', 0x20, __u32)
+
+# Redraw an unchanged scene at least this often so any transient
+# framebuffer corruption self-heals
+_FORCE_REDRAW_SECONDS = 60.0
+
+
+class _FbBitfield(ctypes.Structure):
+    """struct fb_bitfield from <linux/fb.h>."""
+    _fields_ = [
+        ("offset", ctypes.c_uint32),
+        ("length", ctypes.c_uint32),
+        ("msb_right", ctypes.c_uint32),
+    ]
+
+
+class FbVarScreeninfo(ctypes.Structure):
+    """struct fb_var_screeninfo from <linux/fb.h>."""
+    _fields_ = [
+        ("xres", ctypes.c_uint32),
+        ("yres", ctypes.c_uint32),
+        ("xres_virtual", ctypes.c_uint32),
+        ("yres_virtual", ctypes.c_uint32),
+        ("xoffset", ctypes.c_uint32),
+        ("yoffset", ctypes.c_uint32),
+        ("bits_per_pixel", ctypes.c_uint32),
+        ("grayscale", ctypes.c_uint32),
+        ("red", _FbBitfield),
+        ("green", _FbBitfield),
+        ("blue", _FbBitfield),
+        ("transp", _FbBitfield),
+        ("nonstd", ctypes.c_uint32),
+        ("activate", ctypes.c_uint32),
+        ("height", ctypes.c_uint32),
+        ("width", ctypes.c_uint32),
+        ("accel_flags", ctypes.c_uint32),
+        ("pixclock", ctypes.c_uint32),
+        ("left_margin", ctypes.c_uint32),
+        ("right_margin", ctypes.c_uint32),
+        ("upper_margin", ctypes.c_uint32),
+        ("lower_margin", ctypes.c_uint32),
+        ("hsync_len", ctypes.c_uint32),
+        ("vsync_len", ctypes.c_uint32),
+        ("sync", ctypes.c_uint32),
+        ("vmode", ctypes.c_uint32),
+        ("rotate", ctypes.c_uint32),
+        ("colorspace", ctypes.c_uint32),
+        ("reserved", ctypes.c_uint32 * 4),
+    ]
+
+
+class FbFixScreeninfo(ctypes.Structure):
+    """struct fb_fix_screeninfo from <linux/fb.h>.
+
+    The c_ulong fields make the layout (and the natural alignment
+    padding before line_length) come out right on both 32- and 64-bit
+    kernels without any hand-computed offsets.
+    """
+    _fields_ = [
+        ("id", ctypes.c_char * 16),
+        ("smem_start", ctypes.c_ulong),
+        ("smem_len", ctypes.c_uint32),
+        ("type", ctypes.c_uint32),
+        ("type_aux", ctypes.c_uint32),
+        ("visual", ctypes.c_uint32),
+        ("xpanstep", ctypes.c_uint16),
+        ("ypanstep", ctypes.c_uint16),
+        ("ywrapstep", ctypes.c_uint16),
+        ("line_length", ctypes.c_uint32),
+        ("mmio_start", ctypes.c_ulong),
+        ("mmio_len", ctypes.c_uint32),
+        ("accel", ctypes.c_uint32),
+        ("capabilities", ctypes.c_uint16),
+        ("reserved", ctypes.c_uint16 * 2),
+    ]
 
 
 def _read_sysfs_int(path):
@@ -76,12 +137,6 @@ def _read_sysfs_fb_info(fb_device):
     return info
 
 
-def _parse_fscreeninfo(buf):
-    """Extract line_length from fb_fix_screeninfo."""
-    line_length = struct.unpack_from("I", buf, _LINE_LENGTH_OFFSET)[0]
-    return {"line_length": line_length}
-
-
 class FramebufferDisplay:
     """Writes frames directly to the Linux framebuffer (/dev/fb0)."""
 
@@ -93,28 +148,45 @@ class FramebufferDisplay:
         self.yres = 0
         self.bpp = 0
         self.line_length = 0
+        self._tmp8 = None
+        self._tmp16 = None
+        self._rgb565 = None
+        self._bgra = None
+        self._fb_np = None
+        self._fb_cbuf = None
+        self._vinfo = None
+        self._pages = 1
+        self._back = 0
+        self._vsync_ok = True
+        self._page_np = None
+        self._page_16 = None
+        self._page_addrs = None
+        self._stage = None
+        self._stage16 = None
+        self._resize_src_shape = None
+        self._ys = None
+        self._xs = None
+        self._rowtmp = None
+        self._resized = None
 
     def open(self):
         ensure_framebuffer(self.fb_device)
         self.fd = os.open(self.fb_device, os.O_RDWR)
 
         # Read variable screen info
-        vinfo_buf = bytearray(160)
-        fcntl.ioctl(self.fd, FBIOGET_VSCREENINFO, vinfo_buf)
-        vinfo = _parse_vscreeninfo(vinfo_buf)
-        self.xres = vinfo["xres"]
-        self.yres = vinfo["yres"]
-        self.bpp = vinfo["bits_per_pixel"]
-
-        # Read fixed screen info (buffer must be large enough for 64-bit)
-        finfo_buf = bytearray(80)
-        fcntl.ioctl(self.fd, FBIOGET_FSCREENINFO, finfo_buf)
-        finfo = _parse_fscreeninfo(finfo_buf)
-        self.line_length = finfo["line_length"]
+        vinfo = FbVarScreeninfo()
+        fcntl.ioctl(self.fd, FBIOGET_VSCREENINFO, vinfo)
+        self.xres = vinfo.xres
+        self.yres = vinfo.yres
+        self.bpp = vinfo.bits_per_pixel
+
+        # Read fixed screen info
+        finfo = FbFixScreeninfo()
+        fcntl.ioctl(self.fd, FBIOGET_FSCREENINFO, finfo)
+        self.line_length = finfo.line_length
 
         print(f"ioctl values: xres={self.xres} yres={self.yres} "
-              f"bpp={self.bpp} line_length={self.line_length} "
-              f"(ulong_size={_ULONG_SIZE}, ll_offset={_LINE_LENGTH_OFFSET})")
+              f"bpp={self.bpp} line_length={self.line_length}")
 
         # If ioctl returned zeros, try sysfs as fallback
         if self.xres == 0 or self.yres == 0 or self.line_length == 0:
@@ -153,55 +225,370 @@ class FramebufferDisplay:
 
         print(f"Framebuffer: {self.xres}x{self.yres} {self.bpp}bpp, "
               f"line_length={self.line_length}, size={fb_size}")
-        self.fbmap = mmap.mmap(self.fd, fb_size,
-                               mmap.MAP_SHARED,
-                               mmap.PROT_WRITE | mmap.PROT_READ)
-
-    def show(self, frame):
-        """Resize and write a BGR frame to the framebuffer."""
-        resized = cv2.resize(frame, (self.xres, self.yres),
-                             interpolation=cv2.INTER_NEAREST)
 
+        # Try to enable double buffering: with a virtual resolution two
+        # pages tall we can write the offscreen page and flip with
+        # FBIOPAN_DISPLAY, so scan-out never shows a half-written frame.
+        self._vinfo = vinfo
+        self._pages = 1
+        self._back = 0
+        if vinfo.yres == self.yres and self.yres > 0:
+            self._pages = self._try_double_buffer(vinfo)
+
+        try:
+            self.fbmap = self._map_fb(fb_size * self._pages)
+        except OSError:
+            if self._pages == 1:
+                raise
+            # Not enough mappable video memory for two pages
+            self._pages = 1
+            self.fbmap = self._map_fb(fb_size)
+        if self._pages == 2:
+            print("Double buffering enabled (FBIOPAN_DISPLAY)")
+            # Page 0 is visible after _try_double_buffer reset the
+            # offset — draw the first frame on the offscreen page
+            self._back = 1
+
+        # ndarray view of the mapping: one row per scanline, including
+        # any line_length padding past the visible pixels.
+        self._fb_np = np.frombuffer(self.fbmap, dtype=np.uint8).reshape(
+            self.yres * self._pages, self.line_length)
+
+        # Per-page views and raw addresses for the memmove fast path
+        self._fb_cbuf = ctypes.c_char.from_buffer(self.fbmap)
+        base = ctypes.addressof(self._fb_cbuf)
+        self._page_np = [self._fb_np[p * self.yres:(p + 1) * self.yres]
+                         for p in range(self._pages)]
+        self._page_addrs = [base + p * fb_size
+                            for p in range(self._pages)]
+
+        # Padded scanlines: build each frame in an ordinary staging
+        # buffer and blast it into the mapping with one memmove per
+        # frame, instead of strided partial writes into the (typically
+        # write-combining) framebuffer memory.
+        row_bytes = self.xres * (self.bpp // 8)
+        if self.line_length != row_bytes and self.bpp in (16, 32):
+            self._stage = np.zeros((self.yres, self.line_length),
+                                   dtype=np.uint8)
+            if self.bpp == 16 and self.line_length % 2 == 0:
+                self._stage16 = self._stage.view(np.uint16)
+
+        # Preallocate conversion buffers for the 16bpp path so the
+        # per-frame conversion never allocates.
         if self.bpp == 16:
-            converted = self._bgr_to_rgb565(resized)
+            self._tmp8 = np.empty((self.yres, self.xres), dtype=np.uint8)
+            self._tmp16 = np.empty((self.yres, self.xres),
+                                   dtype=np.uint16)
+            self._rgb565 = np.empty((self.yres, self.xres),
+                                    dtype=np.uint16)
+            if self.line_length % 2 == 0:
+                # uint16 views of the pages for the fused kernel
+                self._page_16 = [p.view(np.uint16)
+                                 for p in self._page_np]
         elif self.bpp == 32:
-            converted = cv2.cvtColor(resized, cv2.COLOR_BGR2BGRA)
-            converted = converted.tobytes()
-        else:
-            raise RuntimeError(f"Unsupported framebuffer depth: {self.bpp}bpp")
+            # Reusable BGRA buffer with the alpha plane filled once
+            self._bgra = np.empty((self.yres, self.xres, 4),
+                                  dtype=np.uint8)
+            self._bgra[:, :, 3] = 0xFF
+
+        # Everything about the output path is now fixed — replace
+        # show() with a closure specialized for this geometry.
+        self.show = self._make_show()
+
+    def _map_fb(self, size):
+        """mmap the framebuffer with write-friendly flags.
+
+        MAP_POPULATE prefaults the pages so the first frame doesn't pay
+        the fault cost; mapping write-only avoids forcing an uncached
+        readable mapping on drivers that distinguish; MADV_SEQUENTIAL
+        hints the streaming store pattern. Every knob is best-effort —
+        we fall back to a plain shared read/write mapping.
+        """
+        flags = mmap.MAP_SHARED | getattr(mmap, "MAP_POPULATE", 0)
+        try:
+            m = mmap.mmap(self.fd, size, flags, mmap.PROT_WRITE)
+        except OSError:
+            # Some drivers reject write-only mappings
+            m = mmap.mmap(self.fd, size, flags,
+                          mmap.PROT_WRITE | mmap.PROT_READ)
+        try:
+            m.madvise(mmap.MADV_SEQUENTIAL)
+        except (AttributeError, OSError):
+            pass
+        return m
+
+    def _try_double_buffer(self, vinfo):
+        """Request a two-page virtual resolution. Returns the page count."""
+        vinfo.yres_virtual = self.yres * 2
+        vinfo.yoffset = 0
+        try:
+            fcntl.ioctl(self.fd, FBIOPUT_VSCREENINFO, vinfo)
+            fcntl.ioctl(self.fd, FBIOGET_VSCREENINFO, vinfo)
+        except OSError:
+            return 1
+        if vinfo.yres_virtual >= self.yres * 2:
+            return 2
+        return 1
+
+    def _flip(self):
+        """Pan the display to the page just written and swap roles."""
+        self._vinfo.yoffset = self._back * self.yres
+        try:
+            fcntl.ioctl(self.fd, FBIOPAN_DISPLAY, self._vinfo)
+        except OSError:
+            # Driver refused the pan. Before dropping to single-buffer
+            # writes (which always target page 0), make sure scan-out
+            # is back on page 0 — if the visible offset stuck on page 1
+            # the screen would freeze on stale content forever.
+            self._vinfo.yoffset = 0
+            for req in (FBIOPAN_DISPLAY, FBIOPUT_VSCREENINFO):
+                try:
+                    fcntl.ioctl(self.fd, req, self._vinfo)
+                    break
+                except OSError:
+                    continue
+            self._pages = 1
+            self._back = 0
+            return
+        if self._vsync_ok:
+            try:
+                fcntl.ioctl(self.fd, FBIO_WAITFORVSYNC,
+                            ctypes.c_uint32(0))
+            except OSError:
+                self._vsync_ok = False
+        self._back ^= 1
+
+    def show(self, frame):
+        """Resize and write a BGR or raw YUYV frame to the framebuffer.
+
+        open() replaces this with a closure specialized for the probed
+        geometry (see _make_show).
+        """
+        raise RuntimeError("FramebufferDisplay.show() called before open()")
+
+    def _make_show(self):
+        """Build a show() specialized for the geometry found at open().
+
+        Resolution, depth, stride, destination views and kernel choice
+        are all constant once the framebuffer is probed; binding them
+        as closure locals removes the per-frame attribute lookups and
+        mode branching from the hot path. Only the back-page index and
+        page count stay dynamic (a failed pan can drop us back to
+        single buffering at runtime).
+        """
+        if self.bpp not in (16, 32):
+            raise RuntimeError(
+                f"Unsupported framebuffer depth: {self.bpp}bpp")
 
-        bytes_per_pixel = self.bpp // 8
-        row_bytes = self.xres * bytes_per_pixel
+        xres = self.xres
+        yres = self.yres
+        bpp16 = self.bpp == 16
+        row_bytes = xres * (self.bpp // 8)
 
-        if self.line_length == row_bytes:
-            # No padding — single bulk write (much faster)
-            self.fbmap[:len(converted)] = converted
+        staged = self._stage is not None
+        if staged:
+            dst8s = [self._stage] * self._pages
+            dst16s = [self._stage16] * self._pages
         else:
-            # Row-by-row to handle line_length padding
-            src_offset = 0
-            dst_offset = 0
-            for _ in range(self.yres):
-                self.fbmap[dst_offset:dst_offset + row_bytes] = (
-                    converted[src_offset:src_offset + row_bytes])
-                src_offset += row_bytes
-                dst_offset += self.line_length
-
-    @staticmethod
-    def _bgr_to_rgb565(frame):
-        """Convert BGR888 numpy array to RGB565 bytes."""
-        b = frame[:, :, 0].astype(np.uint16)
-        g = frame[:, :, 1].astype(np.uint16)
-        r = frame[:, :, 2].astype(np.uint16)
-        rgb565 = ((r >> 3) << 11) | ((g >> 2) << 5) | (b >> 3)
-        return rgb565.tobytes()
+            dst8s = self._page_np
+            dst16s = (self._page_16 if self._page_16 is not None
+                      else [None] * self._pages)
+        stage_addr = self._stage.ctypes.data if staged else 0
+        stage_nbytes = self._stage.nbytes if staged else 0
+        page_addrs = self._page_addrs
+        direct = not staged and self.line_length == row_bytes
+
+        fused16 = kernels.HAVE_NUMBA and bpp16 and dst16s[0] is not None
+        fused32 = kernels.HAVE_NUMBA and not bpp16
+
+        memmove = ctypes.memmove
+        update_luts = self._update_resize_luts
+        pack_565 = kernels.resize_pack_565
+        pack_bgra = kernels.resize_pack_bgra
+        resize = self._resize_nearest
+        to_rgb565 = self._bgr_to_rgb565
+        bgra = self._bgra
+
+        last_crc = -1
+        redraw_at = 0.0
+
+        def show(frame):
+            """Resize and write a BGR or raw YUYV frame to the framebuffer."""
+            nonlocal last_crc, redraw_at
+
+            # A frame byte-identical to the previous one would produce
+            # an identical framebuffer — skip the resize, pack and copy
+            # entirely. One crc32 pass over the (small) source is far
+            # cheaper than the full-screen write it elides.
+            crc = zlib.crc32(frame if frame.flags.c_contiguous
+                             else np.ascontiguousarray(frame))
+            now = time.monotonic()
+            if crc == last_crc and now < redraw_at:
+                return
+            last_crc = crc
+            redraw_at = now + _FORCE_REDRAW_SECONDS
+
+            if frame.shape[2] == 2:
+                # Packed YUYV straight from the driver (CONVERT_RGB=0).
+                # Convert directly to the output format where OpenCV
+                # has a fused conversion — no MJPEG decode, no BGR stop.
+                if cv2 is None:
+                    raise RuntimeError("Raw YUYV input requires OpenCV")
+                if bpp16:
+                    frame = cv2.cvtColor(frame, cv2.COLOR_YUV2BGR_YUYV)
+                else:
+                    frame = cv2.cvtColor(frame, cv2.COLOR_YUV2BGRA_YUYV)
+
+            page = self._back
+
+            if fused16:
+                # Fused kernel: resize, pack and output write in one
+                # pixel loop — no intermediate frames at all.
+                update_luts(frame.shape)
+                pack_565(frame, self._ys, self._xs, dst16s[page])
+            elif fused32:
+                update_luts(frame.shape)
+                pack_bgra(frame, self._ys, self._xs, dst8s[page])
+            elif bpp16:
+                converted = to_rgb565(resize(frame))
+                if direct:
+                    memmove(page_addrs[page], converted.ctypes.data,
+                            converted.nbytes)
+                elif dst16s[page] is not None:
+                    dst16s[page][:, :xres] = converted
+                else:
+                    # Odd line_length: byte-level assignment
+                    dst8s[page][:, :row_bytes] = converted.view(
+                        np.uint8).reshape(yres, row_bytes)
+            else:
+                resized = resize(frame)
+                if resized.shape[2] == 4:
+                    converted = resized
+                else:
+                    bgra[:, :, :3] = resized
+                    converted = bgra
+                if direct:
+                    memmove(page_addrs[page], converted.ctypes.data,
+                            converted.nbytes)
+                else:
+                    dst8s[page][:, :row_bytes] = converted.reshape(
+                        yres, row_bytes)
+
+            if staged:
+                # One contiguous copy into the mapping per frame
+                memmove(page_addrs[page], stage_addr, stage_nbytes)
+
+            if self._pages == 2:
+                self._flip()
+
+        return show
+
+    def _update_resize_luts(self, shape):
+        """(Re)build the nearest-neighbor index LUTs for a source shape."""
+        if shape == self._resize_src_shape:
+            return
+        src_h, src_w = shape[:2]
+        self._ys = (np.arange(self.yres) * src_h
+                    // self.yres).astype(np.intp)
+        self._xs = (np.arange(self.xres) * src_w
+                    // self.xres).astype(np.intp)
+        self._rowtmp = np.empty((self.yres,) + shape[1:], dtype=np.uint8)
+        self._resized = np.empty((self.yres, self.xres) + shape[2:],
+                                 dtype=np.uint8)
+        self._resize_src_shape = shape
+
+    def _resize_nearest(self, frame):
+        """Nearest-neighbor resize via index LUTs precomputed per source size.
+
+        The source-to-output index mapping is constant for a fixed pair
+        of sizes, so each resize becomes two gathers into preallocated
+        buffers — no per-frame output allocation or OpenCV dispatch.
+        """
+        if frame.shape[0] == self.yres and frame.shape[1] == self.xres:
+            return frame
+
+        self._update_resize_luts(frame.shape)
+        np.take(frame, self._ys, axis=0, out=self._rowtmp)
+        np.take(self._rowtmp, self._xs, axis=1, out=self._resized)
+        return self._resized
+
+    def _bgr_to_rgb565(self, frame):
+        """Convert a BGR888 numpy array to RGB565 in preallocated buffers.
+
+        Prefers the hand-written NEON library, then the compiled Numba
+        kernel (one pass, SIMD); otherwise a NumPy fallback that shifts
+        in uint8 lanes — r>>3, g>>2 and b>>3 all fit in a byte — and
+        only widens to uint16 for the shifted red/green combine, halving
+        the traffic of a conversion done entirely in uint16.
+        """
+        if kernels.HAVE_NEON:
+            kernels.bgr_to_rgb565_neon(np.ascontiguousarray(frame),
+                                       self._rgb565)
+            return self._rgb565
+
+        if kernels.HAVE_NUMBA:
+            kernels.bgr_to_rgb565(frame, self._rgb565)
+            return self._rgb565
+
+        if cv2 is not None:
+            # OpenCV's conversion is NEON/SSE-vectorized and writes the
+            # same bit layout; give it a 2-channel byte view so it fills
+            # the preallocated buffer in place.
+            cv2.cvtColor(frame, cv2.COLOR_BGR2BGR565,
+                         dst=self._rgb565.view(np.uint8).reshape(
+                             self.yres, self.xres, 2))
+            return self._rgb565
+
+        out = self._rgb565
+        t8 = self._tmp8
+        t16 = self._tmp16
+        # out = (r >> 3) << 11
+        np.right_shift(frame[:, :, 2], 3, out=t8)
+        out[:] = t8
+        np.left_shift(out, 11, out=out)
+        # out |= (g >> 2) << 5
+        np.right_shift(frame[:, :, 1], 2, out=t8)
+        t16[:] = t8
+        np.left_shift(t16, 5, out=t16)
+        np.bitwise_or(out, t16, out=out)
+        # out |= b >> 3 (fits in uint8, promoted in the OR)
+        np.right_shift(frame[:, :, 0], 3, out=t8)
+        np.bitwise_or(out, t8, out=out)
+        return out
 
     def close(self):
+        # Forget the specialized show() so a reopen rebuilds it
+        self.__dict__.pop("show", None)
+        # Drop the ndarray views and ctypes buffer first — mmap.close()
+        # refuses while exported buffers are alive.
+        self._fb_np = None
+        self._page_np = None
+        self._page_16 = None
+        self._page_addrs = None
+        self._fb_cbuf = None
         if self.fbmap is not None:
             self.fbmap.close()
             self.fbmap = None
         if self.fd is not None:
             os.close(self.fd)
             self.fd = None
+        # Release derived state so a reopen starts from scratch instead
+        # of carrying buffers and LUTs sized for the old geometry
+        self._vinfo = None
+        self._pages = 1
+        self._back = 0
+        self._vsync_ok = True
+        self._stage = None
+        self._stage16 = None
+        self._tmp8 = None
+        self._tmp16 = None
+        self._rgb565 = None
+        self._bgra = None
+        self._resize_src_shape = None
+        self._ys = None
+        self._xs = None
+        self._rowtmp = None
+        self._resized = None
 
     def __enter__(self):
         self.open()
@@ -0,0 +1,100 @@
+"""Optional compiled pixel kernels: Numba JIT and a NEON C library.
+
+Neither is a hard dependency: when Numba is missing the JIT kernels are
+None, when libneonkernels.so has not been built (see build_neon.sh) the
+NEON entry points are unavailable, and display.py falls back to its
+NumPy paths. On ARM64 the Numba loops auto-vectorize to NEON; the C
+library is the hand-tuned version of the same pack.
+"""
+
+import ctypes
+import os
+
+import numpy as np
+
+_here = os.path.dirname(os.path.abspath(__file__))
+
+try:
+    _neon = ctypes.CDLL(os.path.join(_here, "libneonkernels.so"))
+    _neon.bgr_to_rgb565_neon.argtypes = (ctypes.c_void_p, ctypes.c_void_p,
+                                         ctypes.c_size_t)
+    _neon.bgr_to_rgb565_neon.restype = None
+    HAVE_NEON = True
+except OSError:
+    _neon = None
+    HAVE_NEON = False
+
+
+def bgr_to_rgb565_neon(frame, out):
+    """Pack a contiguous BGR888 frame into a uint16 array via the C library."""
+    _neon.bgr_to_rgb565_neon(frame.ctypes.data, out.ctypes.data, out.size)
+
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+# Inner-loop tile width for the fused kernels, sized so a block's
+# source triplets (192 B), index slice and packed output all sit in one
+# L1D alongside each other (64 B lines on Cortex-A72/A76).
+_TILE = 64
+
+if HAVE_NUMBA:
+    @njit(parallel=True, cache=True)
+    def bgr_to_rgb565(frame, out):
+        """Pack a BGR888 frame into a preallocated uint16 RGB565 array."""
+        h, w = out.shape
+        for i in prange(h):
+            for j in range(w):
+                b = np.uint16(frame[i, j, 0])
+                g = np.uint16(frame[i, j, 1])
+                r = np.uint16(frame[i, j, 2])
+                out[i, j] = ((r >> 3) << 11) | ((g >> 2) << 5) | (b >> 3)
+
+    @njit(parallel=True, cache=True)
+    def resize_pack_565(src, ys, xs, fb16):
+        """Gather-resize a BGR frame and pack RGB565 into the framebuffer.
+
+        Fuses nearest-neighbor resize, the 565 pack and the mmap write
+        into one pixel loop. fb16 is a uint16 view of the mapping and
+        may be wider than len(xs) when scanlines are padded — only the
+        visible columns are written.
+        """
+        w = xs.shape[0]
+        for i in prange(ys.shape[0]):
+            si = ys[i]
+            for jb in range(0, w, _TILE):
+                jend = min(jb + _TILE, w)
+                for j in range(jb, jend):
+                    sj = xs[j]
+                    b = np.uint16(src[si, sj, 0])
+                    g = np.uint16(src[si, sj, 1])
+                    r = np.uint16(src[si, sj, 2])
+                    fb16[i, j] = (((r >> 3) << 11) | ((g >> 2) << 5)
+                                  | (b >> 3))
+
+    @njit(parallel=True, cache=True)
+    def resize_pack_bgra(src, ys, xs, fb8):
+        """Gather-resize a BGR(A) frame into a 32bpp framebuffer view.
+
+        fb8 is the uint8 page view (one row per scanline, padding
+        included); only the first three source channels are read, so
+        BGR and BGRA input both work. Alpha is forced opaque.
+        """
+        w = xs.shape[0]
+        for i in prange(ys.shape[0]):
+            si = ys[i]
+            for jb in range(0, w, _TILE):
+                jend = min(jb + _TILE, w)
+                for j in range(jb, jend):
+                    sj = xs[j]
+                    k = j * 4
+                    fb8[i, k] = src[si, sj, 0]
+                    fb8[i, k + 1] = src[si, sj, 1]
+                    fb8[i, k + 2] = src[si, sj, 2]
+                    fb8[i, k + 3] = 0xFF
+else:
+    bgr_to_rgb565 = None
+    resize_pack_565 = None
+    resize_pack_bgra = None
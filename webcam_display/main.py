@@ -2,8 +2,11 @@
 """Capture from Logitech C270 webcam and display fullscreen on HDMI via framebuffer."""
 
 import argparse
+import ctypes
+import errno
 import signal
 import sys
+import threading
 import time
 
 import config
@@ -12,12 +15,89 @@ from display import FramebufferDisplay
 
 running = True
 
+# clock_nanosleep(CLOCK_MONOTONIC, TIMER_ABSTIME, ...) sleeps until an
+# absolute deadline, so per-iteration overhead can't drift the frame
+# cadence the way relative time.sleep() does.
+CLOCK_MONOTONIC = 1
+TIMER_ABSTIME = 1
+
+
+class _Timespec(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+
+try:
+    _libc = ctypes.CDLL("libc.so.6", use_errno=True)
+    _libc.clock_nanosleep.argtypes = (ctypes.c_int, ctypes.c_int,
+                                      ctypes.POINTER(_Timespec),
+                                      ctypes.POINTER(_Timespec))
+    _libc.clock_nanosleep.restype = ctypes.c_int
+except (OSError, AttributeError):
+    _libc = None
+
+
+def sleep_until(deadline_ns):
+    """Sleep until an absolute CLOCK_MONOTONIC time in nanoseconds."""
+    if _libc is not None:
+        ts = _Timespec(deadline_ns // 1_000_000_000,
+                       deadline_ns % 1_000_000_000)
+        while _libc.clock_nanosleep(CLOCK_MONOTONIC, TIMER_ABSTIME,
+                                    ctypes.byref(ts), None) == errno.EINTR:
+            pass
+        return
+    remaining = deadline_ns - time.monotonic_ns()
+    if remaining > 0:
+        time.sleep(remaining / 1e9)
+
 
 def stop(signum, frame):
     global running
     running = False
 
 
+class CaptureThread(threading.Thread):
+    """Reads frames in the background, keeping only the newest one.
+
+    Capture (V4L2 dequeue + MJPEG decode) and display (resize + convert
+    + framebuffer write) then overlap instead of running back to back,
+    so throughput approaches the slower of the two stages rather than
+    their sum. The single-slot handoff keeps latency at one frame.
+    """
+
+    def __init__(self, cam):
+        super().__init__(daemon=True)
+        self.cam = cam
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._latest = None
+
+    def run(self):
+        while not self._stopped.is_set():
+            frame = self.cam.read()
+            if frame is None:
+                time.sleep(0.1)
+                continue
+            with self._lock:
+                self._latest = frame
+
+    def get(self):
+        """Return the newest unconsumed frame, or None if nothing new.
+
+        Ownership of the returned buffer transfers to the caller: it
+        is held out of the capture's decode rotation until the next
+        frame is taken.
+        """
+        with self._lock:
+            frame = self._latest
+            self._latest = None
+        if frame is not None:
+            self.cam.hold(frame)
+        return frame
+
+    def stop(self):
+        self._stopped.set()
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Webcam to HDMI framebuffer display")
@@ -35,40 +115,48 @@ def main():
         device_index=args.device,
         width=config.CAPTURE_WIDTH,
         height=config.CAPTURE_HEIGHT,
-        use_mjpeg=config.USE_MJPEG,
+        pixel_format=config.PIXEL_FORMAT,
         buffer_size=config.BUFFER_SIZE,
+        backend=config.CAPTURE_BACKEND,
     ) as cam, FramebufferDisplay(fb_device=args.fb) as fb:
 
-        frame_interval = 1.0 / config.TARGET_FPS
+        interval_ns = 1_000_000_000 // config.TARGET_FPS
         frame_count = 0
-        fps_start = time.monotonic()
+        next_deadline = fps_start = time.monotonic_ns()
+
+        capture = CaptureThread(cam)
+        capture.start()
 
         print(f"Streaming at target {config.TARGET_FPS} FPS. "
               "Press Ctrl+C to stop.")
 
         while running:
-            loop_start = time.monotonic()
-
-            frame = cam.read()
+            frame = capture.get()
             if frame is None:
-                print("Warning: failed to grab frame, retrying...")
-                time.sleep(0.1)
+                # Capture thread hasn't produced a new frame yet
+                time.sleep(0.005)
                 continue
 
             fb.show(frame)
             frame_count += 1
 
             # Print FPS every 5 seconds
-            elapsed = time.monotonic() - fps_start
-            if elapsed >= 5.0:
-                print(f"FPS: {frame_count / elapsed:.1f}")
+            now = time.monotonic_ns()
+            if now - fps_start >= 5_000_000_000:
+                print(f"FPS: {frame_count * 1e9 / (now - fps_start):.1f}")
                 frame_count = 0
-                fps_start = time.monotonic()
-
-            # Throttle to target FPS
-            spent = time.monotonic() - loop_start
-            if spent < frame_interval:
-                time.sleep(frame_interval - spent)
+                fps_start = now
+
+            # Throttle to target FPS on a drift-free running deadline
+            next_deadline += interval_ns
+            if next_deadline > now:
+                sleep_until(next_deadline)
+            else:
+                # Fell behind — don't accumulate sleep debt
+                next_deadline = now
+
+        capture.stop()
+        capture.join(timeout=2.0)
 
     print("Shutdown complete.")
 